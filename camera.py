@@ -1,6 +1,6 @@
 import numpy as np
 
-from geometry import yaw_to_rotation_matrix, intersect_ray_segment
+from geometry import yaw_to_rotation_matrix, intersect_ray_segment, intersect_rays_segments
 
 
 class Camera:
@@ -142,10 +142,11 @@ class Camera:
         return self.K @ self.W2C[:3, :]
 
     def _cast_ray(self, point):
-        """ Casts a ray from pixel at point coordinates and returns its color.
+        """ Casts a ray from pixel at point coordinates and returns color, depth and position of the nearest hit.
         :param point: tuple with x, y coordinates of the pixel
-        :param P_inv: inverted camera projection matrix
-        :return: point color of the nearest wall
+        :return: three-element tuple (color, depth, intersection_point), where depth is the distance to the hit along
+        the camera optical axis and intersection_point is the hit position in the world frame as np.array([x, y]).
+        If the ray does not hit any wall, color is black, depth is np.inf and intersection point is filled with np.nan.
         """
 
         ray_direction_cam_frame = self.K_inv @ np.hstack([point[0], point[1], 1])
@@ -153,9 +154,13 @@ class Camera:
         point_on_image_plane_world_frame = point_on_image_plane_world_frame / point_on_image_plane_world_frame[3]
 
         # p1 - point in camera center, p2 - point on image plane
-        p1 = self.position
+        p1 = np.asarray(self.position, dtype=float)
         p2 = point_on_image_plane_world_frame[:2]
+        # Image plane is at unit depth, so the ray parameter along p2 - p1 is equal to depth
+        r = p2 - p1
         color = (0, 0, 0)
+        depth = np.inf
+        hit_point = np.full(2, np.nan)
         for wall in self.environment.map.walls:
             # q1, q2 - wall vertices
             q1 = wall.vertex1
@@ -164,18 +169,96 @@ class Camera:
             if t is not None:
                 # Check that point is in front of the camera
                 intersection_point = q1 + t * (q2 - q1)
-                direction = np.dot(p2 - p1, intersection_point - p2)
+                direction = np.dot(r, intersection_point - p2)
                 if direction > 0:
-                    color = wall.get_color_at(t)
-        return color
-
-    def get_frame_image(self):
+                    intersection_depth = np.dot(r, intersection_point - p1) / np.dot(r, r)
+                    if intersection_depth < depth:
+                        color = wall.get_color_at(t)
+                        depth = intersection_depth
+                        hit_point = intersection_point
+        return color, depth, hit_point
+
+    def get_frame_image(self, return_depth=False):
         """ Makes a picture of the environment.
-        :return: picture as numpy array in BGR color space
+        :param return_depth: if True, depth and hit point buffers are returned along with the image
+        :return: picture as numpy array in BGR color space. If return_depth is True, three-element tuple
+        (image, depth, hit_points), where depth is np.array of shape (w,) with the depth of every image column and
+        hit_points is np.array of shape (w, 2) with the world coordinates of the corresponding wall points.
+        Columns without a hit have np.inf depth and np.nan hit point.
         """
 
         image = np.zeros((self.image_size[1], self.image_size[0], 3), dtype=np.uint8)
+        depth = np.full(self.image_size[0], np.inf)
+        hit_points = np.full((self.image_size[0], 2), np.nan)
         for x in range(self.image_size[0]):
-            for y in range(self.image_size[1]):
-                image[y, x] = self._cast_ray((x, y))
+            # Camera moves in the plane, so all pixels of a column hit the same wall point
+            color, depth[x], hit_points[x] = self._cast_ray((x, 0))
+            image[:, x] = color
+
+        if return_depth:
+            return image, depth, hit_points
         return image
+
+    def get_frame_images(self, poses, return_depth=False):
+        """ Makes pictures of the environment from several camera poses at once. Camera position and yaw are not
+        changed.
+        :param poses: camera poses as np.array of shape (n, 3) with rows (x, y, yaw)
+        :param return_depth: if True, depth and hit point buffers are returned along with the images
+        :return: pictures as numpy array of shape (n, h, w, 3) in BGR color space. If return_depth is True,
+        three-element tuple (images, depth, hit_points), where depth is np.array of shape (n, w) and hit_points is
+        np.array of shape (n, w, 2), as in get_frame_image().
+        """
+
+        poses = np.asarray(poses, dtype=float).reshape(-1, 3)
+        num_poses = poses.shape[0]
+        width, height = self.image_size
+
+        # Ray directions of the image columns at unit depth in the world frame for zero yaw
+        rays_cam_frame = self.K_inv @ np.vstack([np.arange(width), np.zeros(width), np.ones(width)])
+        rays_init = (self.RC2W_init @ rays_cam_frame)[:2, :]
+
+        # Rotate rays by the yaw of each pose, as yaw_to_rotation_matrix() does
+        sin = np.sin(poses[:, 2])
+        cos = np.cos(poses[:, 2])
+        rays = np.empty((num_poses, width, 2))
+        rays[:, :, 0] = cos[:, None] * rays_init[0] + sin[:, None] * rays_init[1]
+        rays[:, :, 1] = -sin[:, None] * rays_init[0] + cos[:, None] * rays_init[1]
+
+        # Shapes are (poses, columns, walls, 2): p1 - camera centers, p2 - points on image plane
+        p1 = poses[:, None, None, :2]
+        p2 = p1 + rays[:, :, None, :]
+        q1 = self.environment.map.vertices1
+        q2 = self.environment.map.vertices2
+        t = intersect_rays_segments(p1, p2, q1, q2)
+        intersection_points = q1 + t[..., None] * (q2 - q1)
+
+        # Image plane is at unit depth, so the ray parameter is equal to depth, and points in front of the camera
+        # are farther than the image plane
+        r = rays[:, :, None, :]
+        depths = np.sum(r * (intersection_points - p1), axis=-1) / np.sum(r * r, axis=-1)
+        depths = np.where(np.isnan(t) | ~(depths > 1), np.inf, depths)
+
+        image_rows = np.zeros((num_poses, width, 3), dtype=np.uint8)
+        depth = np.full((num_poses, width), np.inf)
+        hit_points = np.full((num_poses, width, 2), np.nan)
+
+        # Map without walls produces black images as get_frame_image() does
+        if depths.shape[-1] > 0:
+            nearest = np.argmin(depths, axis=-1)
+            depth = np.take_along_axis(depths, nearest[..., None], axis=-1)[..., 0]
+            hit = np.isfinite(depth)
+            hit_points = np.take_along_axis(intersection_points, nearest[..., None, None], axis=2)[:, :, 0, :]
+            hit_points[~hit] = np.nan
+
+            t_nearest = np.take_along_axis(t, nearest[..., None], axis=-1)[..., 0]
+            for i, wall in enumerate(self.environment.map.walls):
+                mask = hit & (nearest == i)
+                if np.any(mask):
+                    image_rows[mask] = wall.get_colors_at(t_nearest[mask])
+
+        # Camera moves in the plane, so all rows of an image are the same
+        images = np.repeat(image_rows[:, None, :, :], height, axis=1)
+
+        if return_depth:
+            return images, depth, hit_points
+        return images
@@ -33,6 +33,10 @@ class Wall:
         self.vertex2 = vertex2
         self.segments = Wall._generate_segments(vertex1, vertex2)
 
+        # Segment ends and colors as arrays for vectorized color lookup
+        self._segment_ends = np.array([segment.t2 for segment in self.segments])
+        self._segment_colors = np.array([segment.color for segment in self.segments], dtype=np.uint8)
+
     def get_color_at(self, t):
         """ Returns color of the wall at the point defined by parameter value t, which starts at vertex1.
         :param t: parameter, must be between 0 and 1 inclusive.
@@ -48,6 +52,23 @@ class Wall:
 
         raise ValueError(f'Unable to find segment for parameter {t}')
 
+    def get_colors_at(self, t):
+        """ Returns colors of the wall at the points defined by parameter values t. Vectorized version of
+        get_color_at().
+        :param t: parameters as np.array of shape (n,), must be between 0 and 1 inclusive.
+        :return: colors as np.array of shape (n, 3)
+        """
+        t = np.asarray(t)
+        assert np.all((0 <= t) & (t <= 1))
+
+        points_location = t * np.linalg.norm(self.vertex1 - self.vertex2)
+
+        # Segments are adjacent, so the first segment ending not before the point contains it
+        indices = np.searchsorted(self._segment_ends, points_location)
+        indices = np.minimum(indices, len(self.segments) - 1)
+
+        return self._segment_colors[indices]
+
     @staticmethod
     def _generate_segments(vertex1, vertex2):
         """ Generates segments with random length and colors.
@@ -83,6 +104,10 @@ class Map:
         """
         self.walls = Map._load_wall_data(map_data)
 
+        # Wall vertices as arrays of shape (n, 2) for vectorized ray casting
+        self.vertices1 = np.array([wall.vertex1 for wall in self.walls], dtype=float).reshape(-1, 2)
+        self.vertices2 = np.array([wall.vertex2 for wall in self.walls], dtype=float).reshape(-1, 2)
+
     @staticmethod
     def _load_wall_data(map_data):
         """ Loads map data from dictionary.
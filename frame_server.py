@@ -0,0 +1,401 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import struct
+import tempfile
+import time
+from collections import deque
+
+import numpy as np
+
+from camera import Camera
+from detector import Detector
+from environment import Environment
+
+# Maximum number of render requests in a single batch
+MAX_BATCH_SIZE = 64
+# Maximum number of requests waiting for rendering; readers stop receiving when the queue is full
+MAX_PENDING_REQUESTS = 256
+# Maximum number of requests of a single connection that are queued, rendered or not yet sent
+MAX_IN_FLIGHT_PER_CONNECTION = 32
+# Number of recent requests used for latency statistics
+LATENCY_WINDOW = 10000
+# Maximum size of a request message in bytes; connections sending larger messages are closed
+MAX_REQUEST_SIZE = 64 * 1024
+
+# Unix socket path used by default on systems supporting Unix sockets
+DEFAULT_SOCKET_PATH = os.path.join(tempfile.gettempdir(), 'pvm-slam-frame-server.sock')
+
+# Messages are prefixed by their length as big-endian unsigned 32-bit integer
+_LENGTH = struct.Struct('>I')
+
+
+async def read_message(reader, max_size=None):
+    """ Reads a length-prefixed message from a stream.
+    :param reader: asyncio.StreamReader
+    :param max_size: maximum message size in bytes, or None for no limit
+    :return: message bytes
+    """
+    length, = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+    if max_size is not None and length > max_size:
+        raise ValueError(f'Message size {length} exceeds the limit of {max_size} bytes')
+    return await reader.readexactly(length)
+
+
+def write_message(writer, message):
+    """ Writes a length-prefixed message to a stream. Caller is responsible for draining the writer.
+    :param writer: asyncio.StreamWriter
+    :param message: message bytes
+    """
+    writer.write(_LENGTH.pack(len(message)) + message)
+
+
+class FrameServer:
+    """ Frame server renders camera frames of a shared environment for clients connected over a local socket.
+
+    Requests are JSON messages {"id": ..., "pose": [x, y, yaw], "detect": bool, "depth": bool} or
+    {"id": ..., "type": "stats"}. Each response is a JSON header followed by a message with raw image bytes, which is
+    empty for errors and statistics. Concurrent requests of all clients are rendered in batches by a single vectorized
+    call of Camera.get_frame_images().
+    """
+
+    def __init__(self, environment, focus, image_size, max_batch_size=MAX_BATCH_SIZE,
+                 max_pending=MAX_PENDING_REQUESTS, max_in_flight=MAX_IN_FLIGHT_PER_CONNECTION):
+        """ Frame server constructor.
+        :param environment: environment
+        :param focus: camera focal length
+        :param image_size: image size in pixels as tuple (width, height)
+        :param max_batch_size: maximum number of requests rendered at once
+        :param max_pending: maximum number of requests waiting for rendering
+        :param max_in_flight: maximum number of unanswered requests per connection
+        """
+        self.camera = Camera(environment, focus, image_size, (0, 0), 0)
+        self.detector = Detector()
+        self.max_batch_size = max_batch_size
+        self.max_pending = max_pending
+        self.max_in_flight = max_in_flight
+
+        self._queue = None
+        self._server = None
+        self._batch_task = None
+        # Requests which are being rendered, they are not in the queue anymore
+        self._batch = list()
+        self._connection_tasks = set()
+
+        # Time in seconds from receiving a request to its frame being ready, only for successfully rendered frames
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._batch_sizes = deque(maxlen=LATENCY_WINDOW)
+        self._frames_rendered = 0
+        self._render_errors = 0
+
+    async def start(self, path=None, host='127.0.0.1', port=0):
+        """ Starts serving on a Unix socket if path is given, or on a local TCP socket otherwise.
+        :param path: Unix socket path
+        :param host: TCP host
+        :param port: TCP port, 0 to choose a free one
+        :return: asyncio server
+        """
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._batch_task = asyncio.create_task(self._run_batches())
+        if path is not None:
+            self._server = await asyncio.start_unix_server(self._handle_connection, path=path)
+        else:
+            self._server = await asyncio.start_server(self._handle_connection, host=host, port=port)
+        return self._server
+
+    async def close(self):
+        """ Stops serving, closes client connections and cancels pending requests. """
+        self._server.close()
+        for task in self._connection_tasks:
+            task.cancel()
+
+        self._batch_task.cancel()
+        try:
+            await self._batch_task
+        except asyncio.CancelledError:
+            pass
+        for _, _, future in self._batch:
+            future.cancel()
+        self._batch = list()
+        while not self._queue.empty():
+            _, _, future = self._queue.get_nowait()
+            future.cancel()
+
+        await asyncio.gather(*self._connection_tasks, return_exceptions=True)
+        await self._server.wait_closed()
+
+    def get_stats(self):
+        """ Returns request latency percentiles and batching statistics.
+        :return: dictionary with statistics, latencies are in milliseconds
+        """
+        stats = {
+            'frames_rendered': self._frames_rendered,
+            'render_errors': self._render_errors,
+            'pending': self._queue.qsize() if self._queue is not None else 0,
+        }
+        if self._latencies:
+            latencies_ms = np.array(self._latencies) * 1000
+            for percentile in [50, 90, 99]:
+                stats[f'latency_p{percentile}_ms'] = float(np.percentile(latencies_ms, percentile))
+            stats['mean_batch_size'] = float(np.mean(self._batch_sizes))
+        return stats
+
+    async def _handle_connection(self, reader, writer):
+        """ Receives requests of a single client and sends responses in the order frames are ready.
+        :param reader: asyncio.StreamReader
+        :param writer: asyncio.StreamWriter
+        """
+        write_lock = asyncio.Lock()
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        # Response tasks of the connection and the futures of their frames
+        response_futures = dict()
+        connection_task = asyncio.current_task()
+        self._connection_tasks.add(connection_task)
+
+        try:
+            while True:
+                try:
+                    message = await read_message(reader, MAX_REQUEST_SIZE)
+                except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+                    break
+
+                # Stop reading when the client does not receive its frames
+                await in_flight.acquire()
+                future = asyncio.get_running_loop().create_future()
+                request = None
+                try:
+                    request = json.loads(message)
+                    if request.get('type') == 'stats':
+                        future.set_result(({'id': request.get('id'), 'stats': self.get_stats()}, b''))
+                    else:
+                        pose = np.asarray(request['pose'], dtype=float)
+                        if pose.shape != (3,):
+                            raise ValueError(f'Pose must be [x, y, yaw], got {request["pose"]}')
+                        # Stop reading when the renderer is behind
+                        await self._queue.put((request, time.perf_counter(), future))
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    request_id = request.get('id') if isinstance(request, dict) else None
+                    future.set_result(({'id': request_id, 'error': str(e)}, b''))
+
+                task = asyncio.create_task(self._send_response(writer, write_lock, in_flight, future))
+                response_futures[task] = future
+                task.add_done_callback(response_futures.pop)
+        except asyncio.CancelledError:
+            # Connections are cancelled only when the server is closed, which is not an error of the connection
+            pass
+        finally:
+            # Client is gone or the server is closed, so queued frames are dropped by the batcher and nothing is sent
+            for task, future in list(response_futures.items()):
+                future.cancel()
+                task.cancel()
+            await asyncio.gather(*response_futures, return_exceptions=True)
+            self._connection_tasks.discard(connection_task)
+            writer.close()
+
+    @staticmethod
+    async def _send_response(writer, write_lock, in_flight, future):
+        """ Waits for a frame and sends it to the client.
+        :param writer: asyncio.StreamWriter
+        :param write_lock: lock serializing responses of a connection
+        :param in_flight: semaphore limiting unanswered requests of a connection
+        :param future: future with (header, payload) tuple
+        """
+        try:
+            header, payload = await future
+            async with write_lock:
+                if writer.is_closing():
+                    return
+                write_message(writer, json.dumps(header).encode())
+                write_message(writer, payload)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            in_flight.release()
+
+    async def _run_batches(self):
+        """ Takes all requests waiting in the queue, up to the batch size limit, and renders them at once. New
+        requests are accumulated while the previous batch is rendered.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            batch = [item for item in batch if not item[2].cancelled()]
+            if not batch:
+                continue
+
+            requests = [request for request, _, _ in batch]
+            self._batch = batch
+            try:
+                responses = await loop.run_in_executor(None, self._render_batch, requests)
+            except Exception as e:
+                responses = [({'id': request.get('id'), 'error': str(e)}, b'') for request in requests]
+                self._render_errors += len(batch)
+            else:
+                time_ready = time.perf_counter()
+                self._latencies.extend(time_ready - time_received for _, time_received, _ in batch)
+                self._batch_sizes.append(len(batch))
+                self._frames_rendered += len(batch)
+            self._batch = list()
+
+            for (_, _, future), response in zip(batch, responses):
+                if not future.done():
+                    future.set_result(response)
+
+    def _render_batch(self, requests):
+        """ Renders frames for a batch of requests.
+        :param requests: list of request dictionaries
+        :return: list of (header, payload) tuples
+        """
+        poses = np.array([request['pose'] for request in requests], dtype=float)
+        images, depth, _ = self.camera.get_frame_images(poses, return_depth=True)
+
+        responses = list()
+        for i, request in enumerate(requests):
+            image = images[i]
+            header = {'id': request.get('id'), 'shape': list(image.shape)}
+            if request.get('depth'):
+                # Non-finite values are not valid JSON
+                header['depth'] = [value if np.isfinite(value) else None for value in depth[i].tolist()]
+            if request.get('detect'):
+                keypoints, descriptors = self.detector.detect_and_compute(image)
+                header['keypoints'] = [list(keypoint.pt) for keypoint in keypoints]
+                header['descriptors'] = [descriptor.tolist() for descriptor in descriptors]
+            responses.append((header, image.tobytes()))
+
+        return responses
+
+
+class FrameClient:
+    """ Client of FrameServer. Concurrent requests are sent over a single connection. """
+
+    def __init__(self, reader, writer):
+        """ Frame client constructor. Use FrameClient.connect() to create a client.
+        :param reader: asyncio.StreamReader
+        :param writer: asyncio.StreamWriter
+        """
+        self._reader = reader
+        self._writer = writer
+        self._next_id = 0
+        self._futures = dict()
+        self._closed = False
+        self._receive_task = asyncio.create_task(self._receive())
+
+    @staticmethod
+    async def connect(path=None, host='127.0.0.1', port=None):
+        """ Connects to a frame server on a Unix socket if path is given, or on a local TCP socket otherwise.
+        :param path: Unix socket path
+        :param host: TCP host
+        :param port: TCP port
+        :return: FrameClient object
+        """
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return FrameClient(reader, writer)
+
+    async def render(self, position, yaw, detect=False, depth=False):
+        """ Requests a frame from the given camera pose.
+        :param position: camera center position in world coordinate frame as tuple (x, y)
+        :param yaw: camera yaw angle in world coordinate frame
+        :param detect: if True, keypoints and descriptors are returned
+        :param depth: if True, per-column depth is returned
+        :return: dictionary with 'image' as numpy array in BGR color space, and optionally 'depth' as np.array with
+        np.inf for columns without a hit, 'keypoints' as list of (x, y) points and 'descriptors' as np.array
+        """
+        header, payload = await self._request({'pose': [position[0], position[1], yaw],
+                                               'detect': detect, 'depth': depth})
+
+        result = {'image': np.frombuffer(payload, dtype=np.uint8).reshape(header['shape'])}
+        if depth:
+            result['depth'] = np.array([np.inf if value is None else value for value in header['depth']])
+        if detect:
+            result['keypoints'] = [tuple(point) for point in header['keypoints']]
+            result['descriptors'] = np.array(header['descriptors'], dtype=np.uint8)
+        return result
+
+    async def get_stats(self):
+        """ Requests server statistics.
+        :return: dictionary with statistics, see FrameServer.get_stats()
+        """
+        header, _ = await self._request({'type': 'stats'})
+        return header['stats']
+
+    async def close(self):
+        """ Closes the connection. """
+        self._writer.close()
+        await self._writer.wait_closed()
+        await self._receive_task
+
+    async def _request(self, request):
+        """ Sends a request and waits for its response.
+        :param request: request dictionary without id
+        :return: tuple (header, payload)
+        """
+        # Nothing would resolve the response of a closed connection
+        if self._closed or self._receive_task.done():
+            raise ConnectionError('Connection to frame server is closed')
+
+        request_id = self._next_id
+        self._next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self._futures[request_id] = future
+
+        write_message(self._writer, json.dumps(dict(request, id=request_id)).encode())
+        await self._writer.drain()
+
+        header, payload = await future
+        if 'error' in header:
+            raise ValueError(header['error'])
+        return header, payload
+
+    async def _receive(self):
+        """ Receives responses and passes them to the waiting requests. """
+        try:
+            while True:
+                header = json.loads(await read_message(self._reader))
+                payload = await read_message(self._reader)
+                future = self._futures.pop(header['id'], None)
+                if future is not None and not future.done():
+                    future.set_result((header, payload))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._closed = True
+            for future in self._futures.values():
+                if not future.done():
+                    future.set_exception(ConnectionError('Connection to frame server is closed'))
+            self._futures.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serves camera frames of the environment over a local socket.')
+    parser.add_argument('--map', default='map.json', help='path to JSON file with map description')
+    parser.add_argument('--path', default=DEFAULT_SOCKET_PATH, help='Unix socket path')
+    parser.add_argument('--tcp', action='store_true', help='serve on a local TCP socket instead of a Unix socket')
+    parser.add_argument('--port', type=int, default=8765, help='TCP port')
+    parser.add_argument('--focus', type=float, default=30, help='camera focal length')
+    parser.add_argument('--width', type=int, default=50, help='image width in pixels')
+    parser.add_argument('--height', type=int, default=1, help='image height in pixels')
+    args = parser.parse_args()
+
+    # Local TCP socket is the fallback where Unix sockets are not available
+    path = None if args.tcp or not hasattr(socket, 'AF_UNIX') else args.path
+
+    async def serve():
+        environment = Environment.load_from_file(args.map)
+        frame_server = FrameServer(environment, args.focus, (args.width, args.height))
+        server = await frame_server.start(path=path, port=args.port)
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+if __name__ == '__main__':
+    main()
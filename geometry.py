@@ -43,3 +43,36 @@ def intersect_ray_segment(p1, p2, q1, q2):
         return None
 
     return u
+
+
+def intersect_rays_segments(p1, p2, q1, q2):
+    """
+    Calculates intersections between rays and line segments. Vectorized version of intersect_ray_segment(), arguments
+    are broadcast against each other.
+    :param p1: ray beginning points as np.array of shape (..., 2)
+    :param p2: points on rays as np.array of shape (..., 2)
+    :param q1: segment beginning points as np.array of shape (..., 2)
+    :param q2: segment ending points as np.array of shape (..., 2)
+    :return: parameter values within segments as np.array, with np.nan where there is no intersection or a ray and
+    a segment are collinear or parallel
+    """
+
+    r = p2 - p1
+    s = q2 - q1
+    s_cross_r = _cross_2d(s, r)
+    parallel = np.isclose(s_cross_r, 0)
+
+    u = _cross_2d(p1 - q1, r) / np.where(parallel, 1, s_cross_r)
+
+    return np.where(parallel | (u < 0) | (u > 1), np.nan, u)
+
+
+def _cross_2d(a, b):
+    """
+    Calculates Z component of cross product of 2d vectors.
+    :param a: vectors as np.array of shape (..., 2)
+    :param b: vectors as np.array of shape (..., 2)
+    :return: cross products as np.array of shape (...)
+    """
+
+    return a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0]
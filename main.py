@@ -7,6 +7,7 @@ from camera import Camera
 from detector import Detector
 from environment import Environment
 from frame import Frame
+from occupancy_grid import OccupancyGrid
 from view import View
 
 
@@ -17,6 +18,7 @@ def main():
     detector = Detector()
     matcher = cv2.BFMatcher.create(normType=cv2.NORM_L2, crossCheck=True)
     view = View(environment, camera)
+    occupancy_grid = OccupancyGrid((0, 0), (210, 110), 4)
 
     trajectory = [[100, 100, -90], [700, 100, -90],
                   [700, 100, -180], [700, 300, -180],
@@ -41,7 +43,8 @@ def main():
             camera.position = tuple(trajectory_point[:2])
             camera.yaw = trajectory_point[2]
 
-            camera_image = camera.get_frame_image()
+            camera_image, _, hit_points = camera.get_frame_image(return_depth=True)
+            occupancy_grid.update(camera.position, hit_points)
             kp, des = detector.detect_and_compute(camera_image)
             frame_curr = Frame(camera_image, kp, des)
 
@@ -57,6 +60,7 @@ def main():
             frame_prev = frame_curr
 
             cv2.imshow('map', image_result)
+            cv2.imshow('occupancy grid', occupancy_grid.get_image())
 
             k = cv2.waitKey(20)
             if 27 == k:
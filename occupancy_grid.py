@@ -0,0 +1,101 @@
+import numpy as np
+
+# Log-odds increment for a cell containing a ray end point
+LOG_ODDS_OCCUPIED = 0.85
+# Log-odds increment for a cell traversed by a ray
+LOG_ODDS_FREE = -0.4
+# Log-odds values are clamped to this range so that the map can still adapt to changes
+LOG_ODDS_MIN = -5.0
+LOG_ODDS_MAX = 5.0
+
+
+class OccupancyGrid:
+    """ Occupancy grid map that fuses range scans into per-cell log-odds of occupancy. """
+
+    def __init__(self, origin, size, resolution):
+        """ Occupancy grid constructor.
+        :param origin: world coordinates of the grid corner as tuple (x, y)
+        :param size: grid size in cells as tuple (width, height)
+        :param resolution: cell side length in world units
+        """
+        self.origin = np.asarray(origin, dtype=float)
+        self.size = size
+        self.resolution = resolution
+
+        # Rows correspond to Y and columns to X, as in images
+        self.log_odds = np.zeros((size[1], size[0]))
+        # Scratch mask of the flattened grid used to mark cells during an update
+        self._marks = np.zeros(size[0] * size[1], dtype=bool)
+
+    @property
+    def probabilities(self):
+        """ Occupancy probabilities of the grid cells as np.array of shape (height, width). """
+        return 1 - 1 / (1 + np.exp(self.log_odds))
+
+    def world_to_cell(self, points):
+        """ Converts world coordinates to cell indices.
+        :param points: world coordinates as np.array of shape (..., 2)
+        :return: cell indices (column, row) as integer np.array of shape (..., 2)
+        """
+        return np.floor((np.asarray(points) - self.origin) / self.resolution).astype(int)
+
+    def update(self, position, hit_points):
+        """ Fuses a scan into the grid. Cells between the sensor and the hit points are marked as free, cells with
+        the hit points are marked as occupied. All rays of the scan are traversed at once by sampling them every half
+        a cell, so a cell which a ray only grazes at a corner may be missed.
+        :param position: sensor position in world coordinates as tuple (x, y)
+        :param hit_points: ray end points in world coordinates as np.array of shape (n, 2). Rays without a hit must
+        be filled with np.nan and are skipped.
+        """
+
+        position = np.asarray(position, dtype=float)
+        hit_points = np.asarray(hit_points, dtype=float).reshape(-1, 2)
+        hit_points = hit_points[np.all(np.isfinite(hit_points), axis=1)]
+        if hit_points.shape[0] == 0:
+            return
+
+        # Every ray gets its own number of samples, so that short rays are not sampled as densely as the longest one.
+        # Samples are computed in cell units separately for every axis to avoid temporary arrays of points.
+        start = (position - self.origin) / self.resolution
+        rays = (hit_points - position) / self.resolution
+        num_samples = np.maximum(np.ceil(2 * np.linalg.norm(rays, axis=1)).astype(int), 1)
+        first_samples = np.cumsum(num_samples) - num_samples
+        sample_indices = np.arange(np.sum(num_samples)) - np.repeat(first_samples, num_samples)
+        columns = np.floor(start[0] + sample_indices * np.repeat(rays[:, 0] / num_samples, num_samples)).astype(int)
+        rows = np.floor(start[1] + sample_indices * np.repeat(rays[:, 1] / num_samples, num_samples)).astype(int)
+
+        free_cells = self._to_flat_indices(columns, rows)
+        hit_cells = self.world_to_cell(hit_points)
+        occupied_cells = self._to_flat_indices(hit_cells[:, 0], hit_cells[:, 1])
+
+        # Consecutive samples of a ray mostly fall into the same cell, dropping them is cheaper than sorting
+        free_cells = free_cells[np.hstack([True, free_cells[1:] != free_cells[:-1]])]
+
+        # Occupied cells take precedence over free, marks are reset afterwards to avoid clearing the whole mask
+        self._marks[occupied_cells] = True
+        free_cells = free_cells[~self._marks[free_cells]]
+        self._marks[occupied_cells] = False
+
+        # Cells traversed several times get the same value, because fancy indexing reads all of them before the
+        # assignment, so every cell is updated at most once per scan. Only the updated cells are clamped, so the
+        # update does not depend on the grid size.
+        log_odds = self.log_odds.reshape(-1)
+        for cells, increment in [(free_cells, LOG_ODDS_FREE), (occupied_cells, LOG_ODDS_OCCUPIED)]:
+            log_odds[cells] = np.clip(log_odds[cells] + increment, LOG_ODDS_MIN, LOG_ODDS_MAX)
+
+    def get_image(self):
+        """ Creates an image of the grid, where free cells are white, occupied cells are black and unknown are gray.
+        :return: image as numpy array in BGR color space
+        """
+        gray = np.round(255 * (1 - self.probabilities)).astype(np.uint8)
+        return np.dstack([gray, gray, gray])
+
+    def _to_flat_indices(self, columns, rows):
+        """ Converts cell indices to indices of the flattened grid, dropping cells outside of the grid.
+        :param columns: cell columns as integer np.array of shape (n,)
+        :param rows: cell rows as integer np.array of shape (n,)
+        :return: flat indices as np.array of shape (m,), m <= n
+        """
+        flat_indices = rows * self.size[0] + columns
+        inside = (columns >= 0) & (columns < self.size[0]) & (rows >= 0) & (rows < self.size[1])
+        return flat_indices[inside]
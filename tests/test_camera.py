@@ -0,0 +1,67 @@
+import unittest
+import numpy as np
+
+from camera import Camera
+from environment import Environment
+
+
+class TestCamera(unittest.TestCase):
+    """ Tests for Camera class """
+
+    def test_get_frame_image_depth(self):
+        """ Test for get_frame_image() method returning depth and hit points of the nearest walls.
+        :return:
+        """
+        # Two parallel walls in front of the camera looking along negative Y axis
+        environment = Environment({'map': {'vertices': [[-100, -20], [100, -20], [100, -50], [-100, -50]]}})
+        camera = Camera(environment, 10, (5, 1), (0, 0), 0)
+
+        image, depth, hit_points = camera.get_frame_image(return_depth=True)
+
+        self.assertEqual(image.shape, (1, 5, 3))
+        np.testing.assert_allclose(depth, 20)
+        np.testing.assert_allclose(hit_points[:, 1], -20)
+        np.testing.assert_allclose(hit_points[2], [0, -20], atol=1e-9)
+
+        for x in range(5):
+            color, _, _ = camera._cast_ray((x, 0))
+            np.testing.assert_array_equal(image[0, x], color)
+
+
+    def test_get_frame_images(self):
+        """ Test that get_frame_images() method renders the same frames as get_frame_image() for every pose.
+        :return:
+        """
+        environment = Environment({'map': {'vertices': [[40, 40], [40, 400], [800, 400], [800, 40], [40, 40]]}})
+        camera = Camera(environment, 30, (50, 2), (0, 0), 0)
+        poses = np.array([[100, 100, -np.pi / 2], [700, 300, np.pi], [400, 200, 0.3], [1000, 200, 0]])
+
+        images, depth, hit_points = camera.get_frame_images(poses, return_depth=True)
+
+        self.assertEqual(images.shape, (4, 2, 50, 3))
+        for i, pose in enumerate(poses):
+            camera.position = tuple(pose[:2])
+            camera.yaw = pose[2]
+            image_expected, depth_expected, hit_points_expected = camera.get_frame_image(return_depth=True)
+            np.testing.assert_array_equal(images[i], image_expected)
+            np.testing.assert_allclose(depth[i], depth_expected)
+            np.testing.assert_allclose(hit_points[i], hit_points_expected)
+
+
+    def test_get_frame_images_no_walls(self):
+        """ Test that get_frame_images() method renders black frames of a map without walls as get_frame_image().
+        :return:
+        """
+        environment = Environment({'map': {'vertices': [[40, 40]]}})
+        camera = Camera(environment, 30, (50, 1), (0, 0), 0)
+
+        images, depth, hit_points = camera.get_frame_images([[100, 100, 0]], return_depth=True)
+        image_expected, depth_expected, hit_points_expected = camera.get_frame_image(return_depth=True)
+
+        np.testing.assert_array_equal(images[0], image_expected)
+        np.testing.assert_array_equal(depth[0], depth_expected)
+        np.testing.assert_array_equal(hit_points[0], hit_points_expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
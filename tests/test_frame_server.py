@@ -0,0 +1,226 @@
+import asyncio
+import json
+import os
+import struct
+import tempfile
+import time
+import unittest
+import numpy as np
+
+from environment import Environment
+from frame_server import FrameServer, FrameClient, MAX_REQUEST_SIZE
+
+MAP_DATA = {'map': {'vertices': [[40, 40], [40, 400], [800, 400], [800, 40], [40, 40]]}}
+
+
+class SlowFrameServer(FrameServer):
+    """ Frame server with slow rendering, so that requests accumulate while a batch is rendered. """
+
+    def _render_batch(self, requests):
+        time.sleep(0.05)
+        return super()._render_batch(requests)
+
+
+class FailingFrameServer(FrameServer):
+    """ Frame server which fails to render any frame. """
+
+    def _render_batch(self, requests):
+        raise RuntimeError('Rendering failed')
+
+
+class TestFrameServer(unittest.IsolatedAsyncioTestCase):
+    """ Tests for FrameServer and FrameClient classes """
+
+    async def asyncSetUp(self):
+        self.server, self.client = await self._start(FrameServer)
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.server.close()
+
+    @staticmethod
+    async def _start(server_class, **kwargs):
+        """ Starts a server on a local TCP socket and connects a client to it.
+        :param server_class: FrameServer or its subclass
+        :param kwargs: additional server constructor arguments
+        :return: tuple (server, client)
+        """
+        server = server_class(Environment(MAP_DATA), 30, (50, 1), **kwargs)
+        tcp_server = await server.start()
+        client = await FrameClient.connect(port=tcp_server.sockets[0].getsockname()[1])
+        return server, client
+
+    async def _assert_frames(self, server, results, poses):
+        """ Asserts that received frames are equal to the frames rendered by the server camera.
+        :param server: frame server
+        :param results: list of render() results
+        :param poses: list of poses (x, y, yaw) of the results
+        """
+        images = server.camera.get_frame_images(poses)
+        self.assertEqual(len(results), len(poses))
+        for i, result in enumerate(results):
+            np.testing.assert_array_equal(result['image'], images[i])
+
+    async def test_render(self):
+        """ Test that concurrent requests return the same frames as the camera.
+        :return:
+        """
+        poses = [(100, 100, -np.pi / 2), (700, 300, np.pi), (400, 200, 0.3)]
+        results = await asyncio.gather(*[self.client.render(pose[:2], pose[2], detect=True, depth=True)
+                                         for pose in poses])
+
+        images, depth, _ = self.server.camera.get_frame_images(poses, return_depth=True)
+        for i, result in enumerate(results):
+            np.testing.assert_array_equal(result['image'], images[i])
+            np.testing.assert_allclose(result['depth'], depth[i])
+            keypoints, descriptors = self.server.detector.detect_and_compute(images[i])
+            self.assertEqual(len(result['keypoints']), len(keypoints))
+            np.testing.assert_array_equal(result['descriptors'], np.array(descriptors))
+
+        stats = await self.client.get_stats()
+        self.assertEqual(stats['frames_rendered'], len(poses))
+        self.assertIn('latency_p99_ms', stats)
+
+    async def test_render_invalid_pose(self):
+        """ Test that an invalid request returns an error and does not break the connection.
+        :return:
+        """
+        with self.assertRaises(ValueError):
+            await self.client.render((100, 100), 'north')
+
+        result = await self.client.render((100, 100), 0)
+        self.assertEqual(result['image'].shape, (1, 50, 3))
+
+
+    async def test_render_batches_concurrent_requests(self):
+        """ Test that concurrent requests are rendered in batches.
+        :return:
+        """
+        server, client = await self._start(SlowFrameServer)
+        poses = [(100 + 10 * i, 100, 0.1 * i) for i in range(10)]
+        results = await asyncio.gather(*[client.render(pose[:2], pose[2]) for pose in poses])
+
+        await self._assert_frames(server, results, poses)
+        stats = await client.get_stats()
+        self.assertEqual(stats['frames_rendered'], len(poses))
+        self.assertGreater(stats['mean_batch_size'], 1)
+
+        await client.close()
+        await server.close()
+
+    async def test_render_backpressure(self):
+        """ Test that every request is answered when queue and in-flight limits are reached.
+        :return:
+        """
+        server, client = await self._start(SlowFrameServer, max_pending=1, max_in_flight=1)
+        other_client = await FrameClient.connect(port=server._server.sockets[0].getsockname()[1])
+        poses = [(100 + 10 * i, 100, 0.1 * i) for i in range(10)]
+        results = await asyncio.gather(*[c.render(pose[:2], pose[2])
+                                         for pose in poses for c in [client, other_client]])
+
+        await self._assert_frames(server, results, [pose for pose in poses for _ in range(2)])
+
+        await other_client.close()
+        await client.close()
+        await server.close()
+
+    async def test_render_unix_socket(self):
+        """ Test serving frames over a Unix socket.
+        :return:
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'frame_server.sock')
+            server = FrameServer(Environment(MAP_DATA), 30, (50, 1))
+            await server.start(path=path)
+            client = await FrameClient.connect(path=path)
+
+            result = await client.render((100, 100), 0)
+            await self._assert_frames(server, [result], [(100, 100, 0)])
+
+            await client.close()
+            await server.close()
+
+    async def test_render_after_server_close(self):
+        """ Test that requests fail instead of waiting forever when the server is closed.
+        :return:
+        """
+        await self.server.close()
+        # Let the client receive the end of the stream
+        await asyncio.sleep(0.01)
+
+        with self.assertRaises(ConnectionError):
+            await asyncio.wait_for(self.client.render((100, 100), 0), 2)
+
+    async def test_close_with_pending_requests(self):
+        """ Test that closing the server with requests in the queue and in rendering leaves no pending tasks.
+        :return:
+        """
+        tasks_before = asyncio.all_tasks()
+        server, client = await self._start(SlowFrameServer, max_batch_size=8)
+        renders = [asyncio.ensure_future(client.render((100 + i, 100), 0)) for i in range(64)]
+        await asyncio.sleep(0.02)
+
+        await asyncio.wait_for(server.close(), 2)
+        results = await asyncio.wait_for(asyncio.gather(*renders, return_exceptions=True), 2)
+        await client.close()
+
+        self.assertTrue(any(isinstance(result, ConnectionError) for result in results))
+        self.assertEqual(asyncio.all_tasks() - tasks_before, set())
+
+    async def test_oversized_request_closes_connection(self):
+        """ Test that a message larger than the limit closes the connection without reading the message.
+        :return:
+        """
+        reader, writer = await asyncio.open_connection(port=self.server._server.sockets[0].getsockname()[1])
+        writer.write(struct.pack('>I', MAX_REQUEST_SIZE + 1))
+        await writer.drain()
+
+        self.assertEqual(await asyncio.wait_for(reader.read(), 2), b'')
+        writer.close()
+
+
+    async def test_client_disconnect_drops_requests(self):
+        """ Test that requests of a disconnected client are not rendered or sent anymore.
+        :return:
+        """
+        server, client = await self._start(SlowFrameServer, max_batch_size=4)
+        num_requests = 32
+
+        with self.assertNoLogs('asyncio', level='WARNING'):
+            reader, writer = await asyncio.open_connection(port=server._server.sockets[0].getsockname()[1])
+            for i in range(num_requests):
+                message = json.dumps({'id': i, 'pose': [100, 100, 0], 'detect': True}).encode()
+                writer.write(struct.pack('>I', len(message)) + message)
+            await writer.drain()
+            await asyncio.sleep(0.01)
+            writer.close()
+            await writer.wait_closed()
+
+            # Time to render all the requests one batch after another
+            await asyncio.sleep(0.05 * num_requests / 4 + 0.1)
+
+        stats = await client.get_stats()
+        self.assertLess(stats['frames_rendered'], num_requests)
+
+        await client.close()
+        await server.close()
+
+    async def test_render_error_stats(self):
+        """ Test that failed renders are counted as errors and do not contribute to latency.
+        :return:
+        """
+        server, client = await self._start(FailingFrameServer)
+        with self.assertRaises(ValueError):
+            await client.render((100, 100), 0)
+
+        stats = await client.get_stats()
+        self.assertEqual(stats['render_errors'], 1)
+        self.assertEqual(stats['frames_rendered'], 0)
+        self.assertNotIn('latency_p50_ms', stats)
+
+        await client.close()
+        await server.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
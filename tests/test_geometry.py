@@ -1,7 +1,7 @@
 import unittest
 import numpy as np
 
-from geometry import intersect_ray_segment
+from geometry import intersect_ray_segment, intersect_rays_segments
 
 
 class TestGeometry(unittest.TestCase):
@@ -52,5 +52,18 @@ class TestGeometry(unittest.TestCase):
         self.assertIsNone(u)
 
 
+    def test_intersect_rays_segments(self):
+        """ Test for intersect_rays_segments() function comparing it with intersect_ray_segment().
+        :return:
+        """
+        p1 = np.array([0, 0])
+        p2 = np.array([4, 0])
+        q1 = np.array([[5, -1], [5, 1], [1, 1], [5, 0]])
+        q2 = np.array([[5, 3], [5, 3], [5, 1], [7, 0]])
+        u = intersect_rays_segments(p1, p2, q1, q2)
+        self.assertEqual(u[0], 0.25)
+        self.assertTrue(np.all(np.isnan(u[1:])))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+import numpy as np
+
+from occupancy_grid import OccupancyGrid, LOG_ODDS_FREE, LOG_ODDS_OCCUPIED, LOG_ODDS_MIN, LOG_ODDS_MAX
+
+
+class TestOccupancyGrid(unittest.TestCase):
+    """ Tests for OccupancyGrid class """
+
+    def test_update(self):
+        """ Test for update() method with a single ray along X axis.
+        :return:
+        """
+        grid = OccupancyGrid((0, 0), (10, 3), 1)
+        grid.update((0.5, 1.5), np.array([[5.5, 1.5]]))
+
+        # Every cell is updated once, even though it contains several samples of the ray
+        np.testing.assert_array_equal(grid.log_odds[1, :5], LOG_ODDS_FREE)
+        self.assertEqual(grid.log_odds[1, 5], LOG_ODDS_OCCUPIED)
+        self.assertTrue(np.all(grid.log_odds[1, 6:] == 0))
+        self.assertTrue(np.all(grid.log_odds[[0, 2], :] == 0))
+
+    def test_update_skips_missing_hits(self):
+        """ Test for update() method when rays have no hits or end outside of the grid.
+        :return:
+        """
+        grid = OccupancyGrid((0, 0), (10, 3), 1)
+        grid.update((0.5, 1.5), np.array([[np.nan, np.nan], [20.5, 1.5]]))
+
+        self.assertTrue(np.all(grid.log_odds[1, :] < 0))
+        self.assertTrue(np.all(grid.log_odds[[0, 2], :] == 0))
+
+    def test_update_multiple_rays(self):
+        """ Test for update() method with several rays in a scan.
+        :return:
+        """
+        grid = OccupancyGrid((0, 0), (10, 10), 1)
+        grid.update((0.5, 0.5), np.array([[9.5, 0.5], [0.5, 9.5], [9.5, 9.5]]))
+
+        self.assertTrue(np.all(grid.log_odds[0, :9] < 0))
+        self.assertTrue(np.all(grid.log_odds[:9, 0] < 0))
+        self.assertTrue(np.all(np.diag(grid.log_odds)[:9] < 0))
+        self.assertGreater(grid.log_odds[0, 9], 0)
+        self.assertGreater(grid.log_odds[9, 0], 0)
+        self.assertGreater(grid.log_odds[9, 9], 0)
+        self.assertEqual(grid.log_odds[5, 2], 0)
+
+    def test_update_clamps_log_odds(self):
+        """ Test that repeated updates keep log-odds within limits.
+        :return:
+        """
+        grid = OccupancyGrid((0, 0), (10, 3), 1)
+        for _ in range(100):
+            grid.update((0.5, 1.5), np.array([[5.5, 1.5]]))
+
+        np.testing.assert_array_equal(grid.log_odds[1, :5], LOG_ODDS_MIN)
+        self.assertEqual(grid.log_odds[1, 5], LOG_ODDS_MAX)
+
+    def test_probabilities(self):
+        """ Test for probabilities property.
+        :return:
+        """
+        grid = OccupancyGrid((0, 0), (2, 2), 1)
+        np.testing.assert_allclose(grid.probabilities, 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()